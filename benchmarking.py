@@ -0,0 +1,92 @@
+"""
+Scaffolding shared by the package benchmarks.
+
+compression.benchmark and segmentation.benchmark take the same --sizes,
+--images, --repeat and --output options, benchmark the same synthetic and
+file images one at a time and report them as JSON next to the environment
+they ran in. Only what they measure on every image differs.
+"""
+import json
+import platform
+import sys
+import cv2
+import numpy as np
+
+
+def environment():
+    """
+    Versions and machine a benchmark ran on, to tell apart results that are not comparable.
+    """
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def parse_size(text):
+    """
+    Parse a WIDTHxHEIGHT image size.
+
+    Returns:
+        tuple: The (height, width) of the size.
+    """
+    width, height = (int(side) for side in text.split("x"))
+    return height, width
+
+
+def add_arguments(parser, default_sizes):
+    """
+    Add the options every benchmark takes to an argparse parser.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser of the benchmark.
+        default_sizes (tuple): The (height, width) of the default synthetic images.
+    """
+    parser.add_argument("--sizes", nargs="*", type=parse_size, default=list(default_sizes),
+                        help="Synthetic image sizes as WIDTHxHEIGHT")
+    parser.add_argument("--images", nargs="*", default=[], help="Image files to benchmark too")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file to write, defaults to standard output")
+
+
+def run(benchmark_image, synthetic_image, sizes=(), paths=()):
+    """
+    Benchmark synthetic images of the given sizes and the image files in paths.
+
+    Every image is only loaded when its turn comes, so a single one is held
+    in memory at a time.
+
+    Args:
+        benchmark_image (callable): Called with the name of every image and the
+            RGB image, returns its result.
+        synthetic_image (callable): Generates the RGB synthetic image of a height and width.
+        sizes (list): The (height, width) of every synthetic image.
+        paths (list): The image files.
+
+    Returns:
+        dict: The environment the benchmark ran in and one result per image,
+        ready to be dumped as JSON.
+    """
+    images = [("synthetic_{}x{}".format(width, height), lambda size=(height, width): synthetic_image(*size))
+              for height, width in sizes]
+    images += [(path, lambda path=path: cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)) for path in paths]
+
+    results = []
+    for name, load in images:
+        results.append(benchmark_image(name, load()))
+    return {"environment": environment(), "results": results}
+
+
+def write_report(report, path=None):
+    """
+    Write a benchmark report as JSON to a file, or to standard output when path is None.
+    """
+    if path:
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
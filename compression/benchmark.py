@@ -0,0 +1,215 @@
+"""
+Speed, memory, size and quality benchmark of JPEGCompression.
+
+Run as ``python -m compression.benchmark`` to benchmark synthetic images at
+several resolutions, plus any image files given with --images, and print the
+results as JSON. Comparing the JSON of two versions shows regressions.
+"""
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+import benchmarking
+from .image_compression import JPEGCompression, SUBSAMPLING_FACTORS
+
+DEFAULT_SIZES = ((480, 640), (1080, 1920), (3000, 4000))
+CV2_SAMPLING_FACTORS = {
+    "4:4:4": cv2.IMWRITE_JPEG_SAMPLING_FACTOR_444,
+    "4:2:2": cv2.IMWRITE_JPEG_SAMPLING_FACTOR_422,
+    "4:2:0": cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420,
+}
+# Gaussian window of the SSIM reference implementation and its stabilizing constants
+SSIM_SIGMA = 1.5
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+
+def synthetic_image(height, width, seed=0):
+    """
+    Generate a reproducible photo-like RGB image: smooth color gradients,
+    hard edged shapes and fine grained noise, so that both the low and the
+    high DCT frequencies are exercised.
+
+    Args:
+        height (int): Image height.
+        width (int): Image width.
+        seed (int): Seed of the random shapes and noise.
+
+    Returns:
+        numpy.ndarray: The (height, width, 3) uint8 image.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    cols = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    phase = rng.uniform(0, 2 * np.pi, 3).astype(np.float32)
+    image = 128 + 80 * np.sin(3 * rows + 2 * cols + phase) * np.cos(2 * rows - 4 * cols + phase)
+
+    image = np.ascontiguousarray(image, dtype=np.float32)
+    scale = min(height, width)
+    for _ in range(12):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        color = rng.uniform(0, 255, 3).tolist()
+        if rng.random() < 0.5:
+            cv2.circle(image, center, int(rng.integers(scale // 20, scale // 4)), color, -1)
+        else:
+            size = rng.integers(scale // 20, scale // 3, 2)
+            cv2.rectangle(image, center, (center[0] + int(size[0]), center[1] + int(size[1])), color, -1)
+
+    noise = rng.normal(0, 6, (height, width, 1)).astype(np.float32)
+    return np.clip(image + cv2.GaussianBlur(noise, (0, 0), 0.7)[..., None], 0, 255).astype(np.uint8)
+
+
+def psnr(original, decoded):
+    """
+    Peak signal to noise ratio between two uint8 images, in dB.
+
+    Returns:
+        float: The PSNR, infinity for identical images.
+    """
+    error = np.mean((original.astype(np.float64) - decoded) ** 2)
+    return float("inf") if error == 0 else float(10 * np.log10(255 ** 2 / error))
+
+
+def ssim(original, decoded):
+    """
+    Mean structural similarity between two uint8 images, with the Gaussian
+    window of Wang et al. (2004), averaged over every pixel and channel.
+
+    Local means and variances are computed for the whole image at once with
+    Gaussian blurs rather than window by window.
+
+    Returns:
+        float: The SSIM, 1 for identical images.
+    """
+    x = original.astype(np.float64)
+    y = decoded.astype(np.float64)
+
+    def blur(image):
+        return cv2.GaussianBlur(image, (11, 11), SSIM_SIGMA)
+
+    mean_x, mean_y = blur(x), blur(y)
+    variance_x = blur(x * x) - mean_x ** 2
+    variance_y = blur(y * y) - mean_y ** 2
+    covariance = blur(x * y) - mean_x * mean_y
+    ssim_map = ((2 * mean_x * mean_y + SSIM_C1) * (2 * covariance + SSIM_C2)
+                / ((mean_x ** 2 + mean_y ** 2 + SSIM_C1) * (variance_x + variance_y + SSIM_C2)))
+    return float(ssim_map.mean())
+
+
+def opencv_jpeg_quality(quality):
+    """
+    The cv2.imencode JPEG quality (1 to 100) whose quantization tables match
+    the JPEGCompression quality multiplier.
+
+    libjpeg scales the standard tables by 50 / q below quality 50 and by
+    (100 - q) / 50 above it, while JPEGCompression divides them by its quality.
+    """
+    jpeg_quality = 50 * quality if quality < 1 else 100 - 50 / quality
+    return int(np.clip(round(jpeg_quality), 1, 100))
+
+
+def measure(function, *args, repeat=3):
+    """
+    Time a call and trace its peak memory.
+
+    The peak only counts the allocations tracemalloc sees, those of Python
+    and NumPy, not the buffers native libraries such as libjpeg allocate.
+
+    Args:
+        function (callable): The function to measure.
+        *args: Its arguments.
+        repeat (int): Number of timed calls, the fastest one is reported.
+
+    Returns:
+        tuple: The result of the call, the best time in seconds and the peak
+        memory allocated during one call in bytes.
+    """
+    tracemalloc.start()
+    result = function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best, peak
+
+
+def benchmark_image(name, image, quality=1, subsampling="4:2:0", repeat=3):
+    """
+    Benchmark JPEGCompression and the cv2.imencode JPEG baseline on one image.
+
+    Args:
+        name (str): Label of the image in the results.
+        image (numpy.ndarray): The RGB image.
+        quality (float): JPEGCompression quality, the baseline uses the matching JPEG quality.
+        subsampling (str): Chroma subsampling of both codecs.
+        repeat (int): Number of timed calls per measurement.
+
+    Returns:
+        dict: The image description and one result per codec.
+    """
+    compressor = JPEGCompression(quality=quality, subsampling=subsampling)
+    # Both codecs are compared on the whole blocks JPEGCompression keeps
+    height, width = image.shape[0] - image.shape[0] % 8, image.shape[1] - image.shape[1] % 8
+    image = np.ascontiguousarray(image[:height, :width])
+    megabytes = image.nbytes / 1e6
+
+    def report(size, encode_time, decode_time, decoded):
+        return {
+            "compressed_bytes": size,
+            "bits_per_pixel": 8 * size / (height * width),
+            "encode_mb_per_s": megabytes / encode_time,
+            "decode_mb_per_s": megabytes / decode_time,
+            "psnr": psnr(image, decoded),
+            "ssim": ssim(image, decoded),
+        }
+
+    data, encode_time, encode_peak = measure(compressor.compress_to_bytes, image, repeat=repeat)
+    decoded, decode_time, decode_peak = measure(compressor.decompress_from_bytes, data, repeat=repeat)
+    results = {"jpeg_compression": report(len(data), encode_time, decode_time, decoded)}
+    results["jpeg_compression"].update(encode_peak_mb=encode_peak / 1e6, decode_peak_mb=decode_peak / 1e6)
+
+    jpeg_quality = opencv_jpeg_quality(quality)
+    bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    parameters = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality,
+                  cv2.IMWRITE_JPEG_SAMPLING_FACTOR, CV2_SAMPLING_FACTORS[subsampling]]
+    # No peak memory for the baseline: libjpeg allocates its buffers out of
+    # tracemalloc's sight, so its peak would not be comparable
+    (_, encoded), encode_time, _ = measure(cv2.imencode, ".jpg", bgr, parameters, repeat=repeat)
+    decoded, decode_time, _ = measure(cv2.imdecode, encoded, cv2.IMREAD_COLOR, repeat=repeat)
+    results["opencv_jpeg"] = report(encoded.nbytes, encode_time, decode_time, cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB))
+    results["opencv_jpeg"]["jpeg_quality"] = jpeg_quality
+
+    return {"image": name, "height": height, "width": width, "quality": quality,
+            "subsampling": subsampling, "codecs": results}
+
+
+def run(sizes=DEFAULT_SIZES, paths=(), quality=1, subsampling="4:2:0", repeat=3):
+    """
+    Benchmark synthetic images of the given sizes and the image files in paths.
+
+    Returns:
+        dict: The environment the benchmark ran in and one result per image,
+        ready to be dumped as JSON.
+    """
+    return benchmarking.run(lambda name, image: benchmark_image(name, image, quality, subsampling, repeat),
+                            synthetic_image, sizes, paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    benchmarking.add_arguments(parser, DEFAULT_SIZES)
+    parser.add_argument("--quality", type=float, default=1)
+    parser.add_argument("--subsampling", choices=list(SUBSAMPLING_FACTORS), default="4:2:0")
+    args = parser.parse_args(argv)
+    report = run(args.sizes, args.images, args.quality, args.subsampling, args.repeat)
+    benchmarking.write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
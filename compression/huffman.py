@@ -0,0 +1,227 @@
+import heapq
+import numpy as np
+
+MAX_CODE_LENGTH = 16
+SYNC_INTERVAL = 1024
+
+
+def code_lengths(symbols, num_symbols=256, max_length=MAX_CODE_LENGTH):
+    """
+    Compute Huffman code lengths for a stream of symbols.
+
+    Lengths are limited to max_length bits by repeatedly halving the symbol
+    frequencies and rebuilding the tree, so every code fits a 16-bit lookup table.
+
+    Args:
+        symbols (numpy.ndarray): The symbols to be coded, integers in [0, num_symbols).
+        num_symbols (int): Size of the alphabet.
+        max_length (int): Maximum code length in bits.
+
+    Returns:
+        numpy.ndarray: Code length of every symbol (uint8), 0 for unused symbols.
+    """
+    frequencies = np.bincount(symbols, minlength=num_symbols).astype(np.int64)
+    lengths = np.zeros(num_symbols, dtype=np.uint8)
+    used = np.flatnonzero(frequencies)
+    if len(used) == 1:
+        lengths[used] = 1
+        return lengths
+
+    while len(used) > 1:
+        # Heap entries are (weight, tie breaker, symbols under that node)
+        heap = [(int(frequencies[s]), int(s), [int(s)]) for s in used]
+        heapq.heapify(heap)
+        depth = np.zeros(num_symbols, dtype=np.int64)
+        while len(heap) > 1:
+            weight_a, tie_a, symbols_a = heapq.heappop(heap)
+            weight_b, tie_b, symbols_b = heapq.heappop(heap)
+            merged = symbols_a + symbols_b
+            depth[merged] += 1
+            heapq.heappush(heap, (weight_a + weight_b, min(tie_a, tie_b), merged))
+
+        if depth.max() <= max_length:
+            lengths[used] = depth[used]
+            break
+        frequencies[used] = (frequencies[used] + 1) // 2
+    return lengths
+
+
+def canonical_codes(lengths):
+    """
+    Assign canonical Huffman codes from code lengths.
+
+    Symbols are ordered by (length, symbol value) and numbered consecutively,
+    so the lengths alone are enough to rebuild the code on the decoder side.
+
+    Returns:
+        numpy.ndarray: The code of every symbol (uint32), valid for symbols with a non-zero length.
+    """
+    codes = np.zeros(len(lengths), dtype=np.uint32)
+    code = 0
+    previous_length = 0
+    for symbol in np.lexsort((np.arange(len(lengths)), lengths)):
+        length = int(lengths[symbol])
+        if length == 0:
+            continue
+        code <<= length - previous_length
+        codes[symbol] = code
+        code += 1
+        previous_length = length
+    return codes
+
+
+def pack_bits(values, nbits):
+    """
+    Concatenate variable-length big-endian bit fields into bytes.
+
+    Args:
+        values (numpy.ndarray): Field values, each fitting in its nbits.
+        nbits (numpy.ndarray): Width of every field in bits (0 to 16).
+
+    Returns:
+        bytes: The packed bit stream, zero padded to a whole byte.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    nbits = np.asarray(nbits, dtype=np.int64)
+    ends = np.cumsum(nbits)
+    starts = ends - nbits
+    size = (int(ends[-1]) + 7) // 8 if len(ends) else 0
+
+    # A 16-bit field at any bit offset lies within the 3 bytes starting at its
+    # first byte. Fields never share bits, so summing the byte contributions
+    # of all fields is the same as OR-ing them together.
+    byte = starts >> 3
+    window = values << (24 - (starts & 7) - nbits)
+    stream = np.zeros(size + 3)
+    for index, shift in enumerate((16, 8, 0)):
+        stream += np.bincount(byte + index, weights=(window >> shift) & 0xFF, minlength=size + 3)
+    return stream[:size].astype(np.uint8).tobytes()
+
+
+def read_bits(data, starts, nbits):
+    """
+    Read variable-length big-endian bit fields, the inverse of pack_bits.
+
+    Args:
+        data (bytes): The packed bit stream.
+        starts (numpy.ndarray): Bit offset of every field.
+        nbits (numpy.ndarray): Width of every field in bits (0 to 16).
+
+    Returns:
+        numpy.ndarray: The field values (int64).
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    nbits = np.asarray(nbits, dtype=np.int64)
+    if len(starts) and starts[-1] + nbits[-1] > 8 * len(data):
+        raise ValueError("Truncated bit stream")
+    # A 16-bit field at any bit offset fits in the 24-bit window of its first byte
+    stream = np.frombuffer(bytes(data) + bytes(3), dtype=np.uint8).astype(np.int64)
+    byte = starts >> 3
+    window = (stream[byte] << 16) | (stream[byte + 1] << 8) | stream[byte + 2]
+    return (window >> (24 - (starts & 7) - nbits)) & ((1 << nbits) - 1)
+
+
+def encode(symbols, lengths, interval=SYNC_INTERVAL):
+    """
+    Huffman code a stream of symbols with the canonical code for lengths.
+
+    Args:
+        symbols (numpy.ndarray): The symbols to be coded.
+        lengths (numpy.ndarray): Code length of every symbol, from code_lengths.
+        interval (int): Number of symbols between two sync points.
+
+    Returns:
+        tuple: The coded bit stream (bytes) and the bit offset of every
+        interval-th symbol (numpy.ndarray, uint64), used by decode.
+    """
+    codes = canonical_codes(lengths)
+    nbits = lengths[symbols].astype(np.int64)
+    sync = (np.cumsum(nbits) - nbits)[::interval].astype(np.uint64)
+    return pack_bits(codes[symbols], nbits), sync
+
+
+def _lookup_tables(lengths):
+    """
+    Build the 2**16 entry tables mapping the next 16 bits of a stream to the
+    symbol they start with and the length of its code.
+    """
+    codes = canonical_codes(lengths)
+    table_symbol = np.zeros(1 << MAX_CODE_LENGTH, dtype=np.int64)
+    table_length = np.zeros(1 << MAX_CODE_LENGTH, dtype=np.int64)
+    for symbol in np.flatnonzero(lengths):
+        spread = MAX_CODE_LENGTH - int(lengths[symbol])
+        first = int(codes[symbol]) << spread
+        table_symbol[first:first + (1 << spread)] = symbol
+        table_length[first:first + (1 << spread)] = lengths[symbol]
+    return table_symbol, table_length
+
+
+def decode_at(data, lengths, starts, counts):
+    """
+    Decode several runs of symbols that start at known bit offsets.
+
+    The runs are decoded in lockstep: every step resolves the next symbol of
+    all runs at once through a 2**16 entry lookup table, so the Python loop
+    runs as many times as the longest run has symbols.
+
+    Args:
+        data (bytes): The coded bit stream.
+        lengths (numpy.ndarray): Code length of every symbol, as used by the encoder.
+        starts (numpy.ndarray): Bit offset of the first symbol of every run.
+        counts (numpy.ndarray): Number of symbols in every run.
+
+    Returns:
+        tuple: The decoded symbols of all runs concatenated in order
+        (numpy.ndarray, int64) and the bit offset just past every run.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    positions = np.array(starts, dtype=np.int64)
+    steps = int(counts.max()) if len(counts) else 0
+    table_symbol, table_length = _lookup_tables(lengths)
+
+    # Three zero bytes of padding so a 24-bit window can always be read
+    stream = np.frombuffer(bytes(data) + bytes(3), dtype=np.uint8).astype(np.int64)
+    last_byte = len(stream) - 3
+    symbols = np.zeros((len(counts), steps), dtype=np.int64)
+    for step in range(steps):
+        byte = np.minimum(positions >> 3, last_byte)
+        window = (stream[byte] << 16) | (stream[byte + 1] << 8) | stream[byte + 2]
+        peek = (window >> (8 - (positions & 7))) & 0xFFFF
+        symbols[:, step] = table_symbol[peek]
+        # Finished runs stay put so their end offsets can be checked
+        positions += table_length[peek] * (step < counts)
+
+    if len(counts) and positions.max() > 8 * len(data):
+        raise ValueError("Corrupt Huffman coded data")
+    return symbols[np.arange(steps) < counts[:, None]], positions
+
+
+def decode(data, lengths, count, sync, interval=SYNC_INTERVAL):
+    """
+    Decode count symbols from a canonical Huffman coded bit stream.
+
+    The stream is cut at its sync points into chunks of interval symbols
+    which are decoded in lockstep by decode_at, so the Python loop runs
+    interval times rather than once per symbol.
+
+    Args:
+        data (bytes): The coded bit stream.
+        lengths (numpy.ndarray): Code length of every symbol, as used by the encoder.
+        count (int): Number of symbols in the stream.
+        sync (numpy.ndarray): Bit offset of every interval-th symbol, from encode.
+        interval (int): Number of symbols between two sync points.
+
+    Returns:
+        numpy.ndarray: The decoded symbols (int64).
+    """
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(sync) != -(-count // interval):
+        raise ValueError("Sync points do not match the symbol count")
+
+    counts = np.full(len(sync), interval, dtype=np.int64)
+    counts[-1] = count - (len(sync) - 1) * interval
+    symbols, ends = decode_at(data, lengths, sync, counts)
+    if not np.array_equal(ends[:-1], sync[1:].astype(np.int64)):
+        raise ValueError("Corrupt Huffman coded data")
+    return symbols
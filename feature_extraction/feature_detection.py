@@ -1,5 +1,4 @@
 import cv2
-import matplotlib.pyplot as plt
 from abc import ABC, abstractmethod
 
 class FeatureExtractor(ABC):
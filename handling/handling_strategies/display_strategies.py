@@ -1,6 +1,8 @@
-import matplotlib.pyplot as plt
 from abc import ABC, abstractmethod
 import math
+import time
+import cv2
+import numpy as np
 
 class DisplayStrategy(ABC):
     """
@@ -38,6 +40,8 @@ class SingleDisplayStrategy(DisplayStrategy):
 
         The image is displayed with the specified title.
         """
+        # matplotlib is only imported once a matplotlib strategy is used
+        import matplotlib.pyplot as plt
 
         if figsize is not None:
             plt.figure(figsize=figsize)
@@ -62,6 +66,7 @@ class MultipleDisplayStrategy(DisplayStrategy):
 
         The images are displayed in a grid with titles if provided.
         """
+        import matplotlib.pyplot as plt
 
         num_images = len(images)
         # Calculate the number of rows and columns for the grid
@@ -108,6 +113,7 @@ class GridDisplayStrategy(DisplayStrategy):
 
         The images are displayed in a custom grid layout with titles if provided.
         """
+        import matplotlib.pyplot as plt
         num_images = len(images)
         if num_images != self.rows * self.cols:
             raise ValueError("Number of images should match the grid size (rows x cols).")
@@ -122,3 +128,247 @@ class GridDisplayStrategy(DisplayStrategy):
             plt.imshow(images[i])
             plt.axis("off")
         plt.show()
+
+class MontageDisplayStrategy(DisplayStrategy):
+    """
+    A display strategy composing images into one montage array, without matplotlib.
+
+    Every image is area downscaled to fit its tile and copied into a single
+    canvas allocated up front, with its label drawn by OpenCV in a strip
+    under it. The montage is returned, and written to disk when a path is
+    set, so it also works on machines without a display.
+    """
+
+    def __init__(self, rows=None, cols=None, path=None, tile_size=256, background=0):
+        """
+        Initialize a MontageDisplayStrategy.
+
+        Parameters:
+            rows (int): Number of rows of the montage, computed from the image count when None.
+            cols (int): Number of columns of the montage, computed from the image count when None.
+            path (str): File the montage is written to, when not None.
+            tile_size (int): Side in pixels of the square tile of every image.
+            background (int): Gray level of the canvas around the images.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.path = path
+        self.tile_size = tile_size
+        self.background = background
+
+    def display(self, images, texts, figsize=None):
+        """
+        Compose images into a montage with their labels.
+
+        Parameters:
+            images (list): A list of images, or a single image.
+            texts (list): A list of text labels for the images, or a single label.
+            figsize (tuple): Size (width, height) in inches of the montage at
+                100 pixels per inch, overriding tile_size.
+
+        Returns:
+            numpy.ndarray: The montage as an RGB uint8 array.
+        """
+        if not isinstance(images, (list, tuple)):
+            images, texts = [images], [texts]
+        num_images = len(images)
+        rows, cols = self.rows, self.cols
+        if rows is None and cols is None:
+            # The same layout as MultipleDisplayStrategy
+            rows = int(math.ceil(num_images ** 0.5))
+            cols = int(math.ceil(num_images / rows))
+        elif rows is None:
+            rows = int(math.ceil(num_images / cols))
+        elif cols is None:
+            cols = int(math.ceil(num_images / rows))
+        if num_images > rows * cols:
+            raise ValueError("Number of images exceeds the grid size (rows x cols).")
+
+        label_height = 20 if texts is not None else 0
+        tile_width = tile_height = self.tile_size
+        if figsize is not None:
+            tile_width = int(figsize[0] * 100) // cols
+            tile_height = int(figsize[1] * 100) // rows - label_height
+        cell_height = tile_height + label_height
+        canvas = np.full((rows * cell_height, cols * tile_width, 3), self.background, dtype=np.uint8)
+
+        for i, image in enumerate(images):
+            row, col = divmod(i, cols)
+            tile = self._fit(self._to_rgb(image), tile_width, tile_height)
+            # Center the tile in its cell
+            top = row * cell_height + (tile_height - tile.shape[0]) // 2
+            left = col * tile_width + (tile_width - tile.shape[1]) // 2
+            canvas[top:top + tile.shape[0], left:left + tile.shape[1]] = tile
+            if label_height:
+                cv2.putText(canvas, str(texts[i]), (col * tile_width + 4, (row + 1) * cell_height - 6),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1, cv2.LINE_AA)
+
+        if self.path is not None:
+            cv2.imwrite(self.path, cv2.cvtColor(canvas, cv2.COLOR_RGB2BGR))
+        return canvas
+
+    def _fit(self, image, width, height):
+        """
+        Area downscale an image to fit in width x height, keeping its aspect ratio.
+        """
+        scale = min(width / image.shape[1], height / image.shape[0])
+        if scale >= 1:
+            return image
+        size = (max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _to_rgb(self, image):
+        """
+        Convert a grayscale, RGBA, boolean or non uint8 image into RGB uint8.
+
+        Floating point images in [0, 1] are scaled by 255, other non uint8
+        images are stretched from their minimum to their maximum, like imshow does.
+        """
+        image = np.asarray(image)
+        if image.dtype == bool:
+            image = image.astype(np.uint8) * 255
+        elif image.dtype != np.uint8:
+            low, high = float(image.min()), float(image.max())
+            if np.issubdtype(image.dtype, np.floating) and low >= 0 and high <= 1:
+                low, high = 0.0, 1.0
+            image = ((image.astype(np.float32) - low) * (255 / max(high - low, 1e-12))).astype(np.uint8)
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        if image.shape[2] == 4:
+            return image[:, :, :3]
+        if image.shape[2] == 1:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        return image
+
+class LiveDisplayStrategy(DisplayStrategy):
+    """
+    A display strategy for watching a stream of frames in one window.
+
+    The figure and one imshow artist per image are created on the first call
+    and only have their data replaced afterwards. Every update restores the
+    cached background and redraws just the artists with blitting, so the
+    display range of grayscale frames is fixed by the first frame: the full
+    range of boolean and uint8 frames, [0, 1] for floating point frames
+    within it, the frame minimum to maximum otherwise. Frames
+    arriving faster than fps are dropped without touching matplotlib. The
+    next update is also held back in proportion to how long the last one
+    took, so rendering never takes more than max_load of the time of the
+    pipeline feeding it, however slow the display is.
+
+    Attributes:
+        fps (float): Maximum number of updates per second.
+        max_load (float): Largest fraction of the caller's time spent rendering.
+        rendered (int): Number of frames drawn.
+        dropped (int): Number of frames skipped by the frame rate limit.
+    """
+
+    def __init__(self, fps=30, max_load=0.25):
+        """
+        Initialize a LiveDisplayStrategy.
+
+        Parameters:
+            fps (float): Maximum number of updates per second.
+            max_load (float): Largest fraction of the caller's time spent rendering, in (0, 1].
+        """
+        if not 0 < max_load <= 1:
+            raise ValueError("max_load must be in (0, 1]")
+        self.fps = fps
+        self.max_load = max_load
+        self.rendered = 0
+        self.dropped = 0
+        self.figure = None
+        self._artists = []
+        self._layout = None
+        self._background = None
+        self._next_time = 0.0
+
+    def display(self, images, texts, figsize=None):
+        """
+        Show the next frame, or drop it when it comes too early.
+
+        Parameters:
+            images (list): The frame, or a list of frames shown side by side.
+            texts (list): The title of the frame, or a list of titles.
+            figsize (tuple): A tuple specifying the figure size (width, height), used when the figure is created.
+
+        Returns:
+            bool: Whether the frame was drawn.
+        """
+        now = time.perf_counter()
+        if now < self._next_time:
+            self.dropped += 1
+            return False
+        import matplotlib.pyplot as plt
+
+        if not isinstance(images, (list, tuple)):
+            images, texts = [images], [texts]
+        layout = [(np.shape(image), np.asarray(image).dtype, str(text)) for image, text in zip(images, texts)]
+        if self.figure is None or not plt.fignum_exists(self.figure.number) or layout != self._layout:
+            self._create(images, texts, figsize)
+            self._layout = layout
+        else:
+            canvas = self.figure.canvas
+            canvas.restore_region(self._background)
+            for artist, image in zip(self._artists, images):
+                artist.set_data(image)
+                artist.axes.draw_artist(artist)
+            canvas.blit(self.figure.bbox)
+            canvas.flush_events()
+        self.rendered += 1
+
+        # Scheduled from the end of the render, so its cost is counted
+        end = time.perf_counter()
+        cost = end - now
+        self._next_time = end + max(1 / self.fps - cost, cost * (1 / self.max_load - 1))
+        return True
+
+    def close(self):
+        """
+        Close the window, the next frame opens a new one.
+        """
+        if self.figure is not None:
+            import matplotlib.pyplot as plt
+            plt.close(self.figure)
+        self.figure = None
+
+    def _create(self, images, texts, figsize):
+        """
+        (Re)build the figure and its artists, and cache the background for blitting.
+        """
+        import matplotlib.pyplot as plt
+        self.close()
+        plt.ion()
+        num_images = len(images)
+        rows = int(math.ceil(num_images ** 0.5))
+        cols = int(math.ceil(num_images / rows))
+        self.figure = plt.figure(figsize=figsize)
+        self._artists = []
+        for i, (image, text) in enumerate(zip(images, texts)):
+            axes = self.figure.add_subplot(rows, cols, i + 1)
+            axes.set_title(text)
+            axes.axis("off")
+            # The range is fixed from the first frame, so new data never needs rescaling
+            vmin, vmax = self._value_range(image) if np.ndim(image) == 2 else (None, None)
+            self._artists.append(axes.imshow(image, cmap="gray" if vmin is not None else None,
+                                             vmin=vmin, vmax=vmax, animated=True))
+
+        canvas = self.figure.canvas
+        canvas.draw()
+        self._background = canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self._artists:
+            artist.axes.draw_artist(artist)
+        canvas.blit(self.figure.bbox)
+        plt.show(block=False)
+        canvas.flush_events()
+
+    def _value_range(self, image):
+        # vmin and vmax of the artist showing a grayscale frame
+        image = np.asarray(image)
+        if image.dtype == bool:
+            return 0, 1
+        if image.dtype == np.uint8:
+            return 0, 255
+        low, high = float(image.min()), float(image.max())
+        if np.issubdtype(image.dtype, np.floating) and low >= 0 and high <= 1:
+            return 0.0, 1.0
+        return low, max(high, low + 1)
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+
+class DownloadCache:
+    """
+    On-disk cache of downloaded URL bodies for the URL import strategies.
+
+    Bodies are stored once per content, as files named by their SHA-256, so
+    URLs serving the same bytes share a blob. A SQLite index maps every URL to
+    its blob and to the ETag and Last-Modified validators of its response, so
+    the strategies can revalidate with a conditional request instead of
+    downloading again. When the blobs grow past max_bytes the least recently
+    used URLs are evicted.
+
+    Attributes:
+        directory: Directory holding the index and the blobs.
+        max_bytes: Size budget of the blobs in bytes.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        """
+        Open, or create, a cache directory.
+
+        Args:
+            directory: Directory holding the index and the blobs.
+            max_bytes: Size budget of the blobs in bytes, 1 GiB by default.
+        """
+        # sqlite3 is only imported once a cache is actually used
+        import sqlite3
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._database = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        with self._database:
+            self._database.execute(
+                "CREATE TABLE IF NOT EXISTS entries (url TEXT PRIMARY KEY, blob TEXT, size INTEGER, "
+                "etag TEXT, last_modified TEXT, accessed REAL)")
+            self._database.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        # The budget may be smaller than the one the cache was filled with
+        self._evict()
+
+    def validators(self, url):
+        """
+        Conditional request headers revalidating the cached body of a URL.
+
+        Args:
+            url: The URL to revalidate.
+
+        Returns:
+            A dict of If-None-Match and If-Modified-Since headers, empty when the URL is not cached.
+        """
+        with self._lock:
+            row = self._database.execute("SELECT etag, last_modified FROM entries WHERE url = ?",
+                                         (url,)).fetchone()
+        headers = {}
+        if row is not None:
+            if row[0]:
+                headers["If-None-Match"] = row[0]
+            if row[1]:
+                headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def load(self, url):
+        """
+        Read the cached body of a URL, after the server confirmed it is still valid.
+
+        Args:
+            url: The cached URL.
+
+        Returns:
+            The body as bytes, or None when it is not cached (anymore).
+        """
+        with self._lock:
+            row = self._database.execute("SELECT blob FROM entries WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._blob_path(row[0]), "rb") as file:
+                    body = file.read()
+            except FileNotFoundError:
+                with self._database:
+                    self._database.execute("DELETE FROM entries WHERE url = ?", (url,))
+                return None
+            with self._database:
+                self._database.execute("UPDATE entries SET accessed = ? WHERE url = ?", (time.time(), url))
+        return body
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """
+        Cache the body of a URL with the validators of its response, then
+        evict the least recently used URLs beyond max_bytes.
+
+        Args:
+            url: The downloaded URL.
+            body: The response body as bytes.
+            etag: The ETag header of the response, if any.
+            last_modified: The Last-Modified header of the response, if any.
+        """
+        if len(body) > self.max_bytes:
+            return
+        blob = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(blob)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write under a temporary name so readers never see a partial blob
+                descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+                with os.fdopen(descriptor, "wb") as file:
+                    file.write(body)
+                os.replace(temporary, path)
+            previous = self._database.execute("SELECT blob FROM entries WHERE url = ?", (url,)).fetchone()
+            with self._database:
+                self._database.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                       (url, blob, len(body), etag, last_modified, time.time()))
+            if previous is not None and previous[0] != blob:
+                self._remove_orphan(previous[0])
+            self._evict()
+
+    def size(self):
+        """
+        Total size of the cached blobs in bytes.
+        """
+        with self._lock:
+            return self._size()
+
+    def _size(self):
+        (total,) = self._database.execute("SELECT SUM(size) FROM (SELECT DISTINCT blob, size FROM entries)").fetchone()
+        return total or 0
+
+    def _evict(self):
+        """
+        Drop the least recently used URLs until the blobs fit in max_bytes.
+        """
+        total = self._size()
+        if total <= self.max_bytes:
+            return
+        oldest = self._database.execute("SELECT url, blob, size FROM entries ORDER BY accessed").fetchall()
+        for url, blob, size in oldest:
+            if total <= self.max_bytes:
+                break
+            with self._database:
+                self._database.execute("DELETE FROM entries WHERE url = ?", (url,))
+            if self._remove_orphan(blob):
+                total -= size
+
+    def _remove_orphan(self, blob):
+        """
+        Delete a blob no URL refers to anymore, returns whether it was deleted.
+        """
+        if self._database.execute("SELECT 1 FROM entries WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+            return False
+        try:
+            os.remove(self._blob_path(blob))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _blob_path(self, blob):
+        return os.path.join(self.directory, "blobs", blob[:2], blob)
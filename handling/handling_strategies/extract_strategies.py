@@ -1,16 +1,214 @@
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
 import cv2
-import urllib.request
+import urllib.parse
+import math
+import struct
 import numpy as np
 
+from .download_cache import DownloadCache
+from .image_cache import ImageCache
+from .packed_dataset import PackedDataset
+
+# imread/imdecode flags decoding at 1/n of the full resolution, in the DCT domain for JPEG
+REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# JPEG start of frame markers, which carry the image size
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _encoded_size(data):
+    """
+    Read the (width, height) of a JPEG or PNG image from its header, without decoding it.
+
+    Returns:
+        The size, or None for other formats or a header that cannot be parsed.
+    """
+    data = memoryview(data)
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        (length,) = struct.unpack(">H", data[offset + 2:offset + 4])
+        offset += 2 + length
+    return None
+
+
+def _target_size(width, height, scale, max_side):
+    """
+    The (width, height) of a width x height image reduced by scale and to at most max_side.
+    """
+    factor = 1.0 if scale is None else scale
+    if max_side is not None:
+        factor = min(factor, max_side / max(width, height))
+    factor = min(factor, 1.0)
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def _urlopen(url, headers, timeout=None):
+    """
+    Download a URL with urllib, returning the status, body and headers of the response.
+
+    A 304 Not Modified answer to a conditional request is returned, not raised.
+    """
+    # The HTTP stack is only imported by the URL strategies
+    import urllib.error
+    import urllib.request
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+            return response.getcode() or 200, response.read(), response.headers
+    except urllib.error.HTTPError as error:
+        if error.code != 304:
+            raise
+        return 304, b"", error.headers
+
+
+def _cached_download(url, cache, fetch):
+    """
+    Download a URL through an optional DownloadCache.
+
+    Cached URLs are revalidated with a conditional request and only
+    downloaded again when the server reports a change.
+
+    Args:
+        url: The URL to download.
+        cache: A DownloadCache, or None to always download.
+        fetch: Callable (url, headers) returning the status, body and headers of a GET request.
+
+    Returns:
+        The body of the URL as bytes.
+    """
+    if cache is None:
+        return fetch(url, {})[1]
+    status, body, headers = fetch(url, cache.validators(url))
+    if status == 304:
+        body = cache.load(url)
+        if body is not None:
+            return body
+        # Evicted since the validators were read, download unconditionally
+        status, body, headers = fetch(url, {})
+    cache.store(url, body, headers.get("ETag"), headers.get("Last-Modified"))
+    return body
+
+
 class ImportStrategy:
     """
     Abstract base class for image import strategies.
 
     Attributes:
-        None
+        scale: Factor in (0, 1] the imported images are reduced by, or None.
+        max_side: Largest side in pixels the imported images are reduced to, or None.
     """
 
+    scale = None
+    max_side = None
+
+    def set_resolution(self, scale=None, max_side=None):
+        """
+        Import reduced resolution images.
+
+        JPEG images are decoded directly at 1/2, 1/4 or 1/8 of their size by
+        OpenCV's IMREAD_REDUCED modes, the largest reduction that still gives
+        at least the requested size, and then area resized to it. Images of
+        other formats, or that do not need decoding, are area resized.
+
+        Args:
+            scale: Factor in (0, 1] to reduce both sides by, or None.
+            max_side: Largest side in pixels, or None. Smaller images are not enlarged.
+        """
+        if scale is not None and not 0 < scale <= 1:
+            raise ValueError("scale must be in (0, 1]")
+        if max_side is not None and max_side < 1:
+            raise ValueError("max_side must be at least 1")
+        self.scale = scale
+        self.max_side = max_side
+
+    def read_image(self, path):
+        """
+        Read an image file in RGB format, at the resolution of this strategy.
+        """
+        if self.scale is None and self.max_side is None:
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError("Could not read the image at {}".format(path))
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return self.decode_image(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def decode_image(self, data, flags=-1):
+        """
+        Decode an encoded image in RGB format, at the resolution of this strategy.
+
+        Args:
+            data: The encoded image, bytes or a uint8 NumPy array.
+            flags: cv2.imdecode flags used at full resolution. Reduced
+                resolution decoding always decodes to 3 channel color.
+
+        Returns:
+            The decoded image.
+        """
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        if self.scale is None and self.max_side is None:
+            image = cv2.imdecode(buffer, flags)
+        else:
+            size = _encoded_size(buffer)
+            if size is not None:
+                target = _target_size(*size, self.scale, self.max_side)
+                factor = max(target[0] / size[0], target[1] / size[1])
+            elif self.max_side is None:
+                factor = self.scale
+            else:
+                # Without a readable header the size is only known after decoding
+                factor = 1.0
+            reduction = max(r for r in REDUCED_READ_FLAGS if r * factor <= 1)
+            reduced_flags = REDUCED_READ_FLAGS[reduction]
+            # Return the same orientation as the full resolution decode:
+            # IMREAD_UNCHANGED (negative flags) ignores the EXIF orientation
+            if flags < 0 or flags & cv2.IMREAD_IGNORE_ORIENTATION:
+                reduced_flags |= cv2.IMREAD_IGNORE_ORIENTATION
+            image = cv2.imdecode(buffer, reduced_flags)
+            if image is not None:
+                # The header size is before the EXIF rotation, the decoded image after it
+                decoded = (image.shape[1], image.shape[0])
+                full_size = (decoded[0] * reduction, decoded[1] * reduction)
+                if size is not None:
+                    full_size = size if (-(-size[0] // reduction), -(-size[1] // reduction)) == decoded else size[::-1]
+                image = self._resize(image, _target_size(*full_size, self.scale, self.max_side))
+        if image is None:
+            raise ValueError("Could not decode the image")
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def resize_image(self, image):
+        """
+        Area resize an already decoded image to the resolution of this strategy.
+        """
+        if self.scale is None and self.max_side is None:
+            return image
+        height, width = image.shape[:2]
+        return self._resize(image, _target_size(width, height, self.scale, self.max_side))
+
+    def _resize(self, image, size):
+        if (image.shape[1], image.shape[0]) == tuple(size):
+            return image
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
     @abstractmethod
     def import_image(self, source):
         """
@@ -29,9 +227,18 @@ class FilePathImportStrategy(ImportStrategy):
     Image import strategy for importing images from a local file path.
 
     Attributes:
-        None
+        cache: ImageCache the decoded image is shared through, or None.
     """
 
+    def __init__(self, cache=None):
+        """
+        Initialize a FilePathImportStrategy.
+
+        Args:
+            cache: Optional ImageCache, so files requested again are not decoded again.
+        """
+        self.cache = cache
+
     def import_image(self, source):
         """
         Import an image from a file path.
@@ -40,20 +247,29 @@ class FilePathImportStrategy(ImportStrategy):
             source: The file path to the image.
 
         Returns:
-            An image in RGB format.
+            An image in RGB format, read-only when it comes from the cache.
         """
-        image = cv2.imread(source)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        return image
+        if self.cache is not None:
+            return self.cache.get(source, self.read_image, (self.scale, self.max_side))
+        return self.read_image(source)
 
 class UrlImportStrategy(ImportStrategy):
     """
     Image import strategy for importing images from a URL.
 
     Attributes:
-        None
+        cache: DownloadCache the image is revalidated against, or None.
     """
 
+    def __init__(self, cache=None):
+        """
+        Initialize a UrlImportStrategy.
+
+        Args:
+            cache: Optional DownloadCache, so unchanged images are not downloaded again.
+        """
+        self.cache = cache
+
     def import_image(self, source):
         """
         Import an image from a URL.
@@ -64,11 +280,9 @@ class UrlImportStrategy(ImportStrategy):
         Returns:
             An image in RGB format.
         """
-        response = urllib.request.urlopen(source)
-        image_array = np.asarray(bytearray(response.read()), dtype=np.uint8)
-        image = cv2.imdecode(image_array, -1)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        return image
+        data = _cached_download(source, self.cache, _urlopen)
+        image_array = np.frombuffer(data, dtype=np.uint8)
+        return self.decode_image(image_array, -1)
 
 class NumpyImportStrategy(ImportStrategy):
     """
@@ -86,9 +300,10 @@ class NumpyImportStrategy(ImportStrategy):
             source: The NumPy array representing the image.
 
         Returns:
-            The input NumPy array representing the image.
+            The input NumPy array representing the image, area resized when a
+            reduced resolution is set.
         """
-        return source
+        return self.resize_image(source)
 
 class RandomImportStrategy(ImportStrategy):
     """
@@ -120,7 +335,10 @@ class RandomImportStrategy(ImportStrategy):
         Returns:
             A randomly generated image as a NumPy array (grayscale).
         """
-        image = np.random.randint(0, 256, (self.height, self.width), dtype=np.uint8)
+        width, height = self.width, self.height
+        if self.scale is not None or self.max_side is not None:
+            width, height = _target_size(width, height, self.scale, self.max_side)
+        image = np.random.randint(0, 256, (height, width), dtype=np.uint8)
         return image
 
 
@@ -128,10 +346,45 @@ class URLListStrategy(ImportStrategy):
     """
     Image import strategy for importing images from a list of URLs.
 
+    The URLs are fetched concurrently by a bounded pool of threads. Every
+    thread keeps one keep-alive connection per host, so a list of images
+    from the same server costs one connection per thread rather than one
+    per image. URLs that a proxy applies to, from the http_proxy, https_proxy
+    and no_proxy environment variables, are fetched through urllib, which
+    honours them. A URL listed several times is only fetched once. Failed
+    requests are retried with exponential backoff, and URLs that still fail
+    are reported in errors instead of aborting the batch.
+
     Attributes:
-        None
+        max_workers: Maximum number of requests in flight at once.
+        timeout: Socket timeout of every request, in seconds.
+        retries: Number of retries after a connection error or a 5xx or 429 response.
+        backoff: Delay before the first retry in seconds, doubled for every further retry.
+        cache: DownloadCache the images are revalidated against, or None.
+        errors: Exception of every URL that failed in the last import, by index in the source list.
     """
 
+    def __init__(self, max_workers=8, timeout=10, retries=3, backoff=0.5, cache=None):
+        """
+        Initialize a URLListStrategy.
+
+        Args:
+            max_workers: Maximum number of requests in flight at once, 1 fetches serially.
+            timeout: Socket timeout of every request, in seconds.
+            retries: Number of retries after a connection error or a 5xx or 429 response.
+            backoff: Delay before the first retry in seconds, doubled for every further retry.
+            cache: Optional DownloadCache, so unchanged images are not downloaded again.
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.errors = {}
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
     def import_image(self, source):
         """
         Import an image from a list of URLs.
@@ -140,25 +393,146 @@ class URLListStrategy(ImportStrategy):
             source: A list of URLs of the images.
 
         Returns:
-            A list of images in RGB format.
+            A list of images in RGB format, in the order of source. The entries
+            of URLs that could not be fetched or decoded are None, their
+            exceptions are in errors.
         """
-        images = []
-        for url in source:
-            response = urllib.request.urlopen(url)
-            image_array = np.asarray(bytearray(response.read()), dtype=np.uint8)
-            image = cv2.imdecode(image_array, -1)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            images.append(image)
+        urls = list(source)
+        indices = {}
+        for index, url in enumerate(urls):
+            indices.setdefault(url, []).append(index)
+
+        self.errors = {}
+        images = [None] * len(urls)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(indices)))) as executor:
+                futures = {executor.submit(self._fetch_image, url): url for url in indices}
+                for future in as_completed(futures):
+                    first, *duplicates = indices[futures[future]]
+                    try:
+                        images[first] = future.result()
+                    except Exception as error:
+                        self.errors.update((index, error) for index in [first] + duplicates)
+                        continue
+                    # Every entry gets its own array, as if it had been downloaded separately
+                    for index in duplicates:
+                        images[index] = images[first].copy()
+        finally:
+            self._close_connections()
         return images
 
+    def _fetch_image(self, url):
+        """
+        Fetch and decode one image, retrying transient failures.
+        """
+        import http.client
+        import urllib.error
+        for attempt in range(self.retries + 1):
+            try:
+                data = _cached_download(url, self.cache, self._fetch)
+                break
+            except urllib.error.HTTPError as error:
+                if error.code < 500 and error.code != 429 or attempt == self.retries:
+                    raise
+            except (OSError, http.client.HTTPException):
+                if attempt == self.retries:
+                    raise
+            time.sleep(self.backoff * 2 ** attempt)
+
+        try:
+            return self.decode_image(data, -1)
+        except ValueError:
+            raise ValueError("Could not decode the image at {}".format(url))
+
+    def _fetch(self, url, headers, redirects=5):
+        """
+        GET a URL over this thread's connection to its host, returning the
+        status, body and headers of the response.
+        """
+        import http.client
+        import urllib.error
+        import urllib.request
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return _urlopen(url, headers, self.timeout)
+        # URLs to fetch through a proxy (http_proxy, https_proxy, no_proxy) go through urllib
+        if parts.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(parts.hostname or ""):
+            return _urlopen(url, headers, self.timeout)
+
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        while True:
+            connection, reused = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", path, headers=dict(headers, **{"User-Agent": "Python-urllib"}))
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self._drop_connection(parts.scheme, parts.netloc)
+                # The server may have closed an idle keep-alive connection, reconnect once
+                if not reused:
+                    raise
+        if response.will_close:
+            self._drop_connection(parts.scheme, parts.netloc)
+
+        if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+            if redirects == 0:
+                raise urllib.error.HTTPError(url, response.status, "Too many redirects", response.headers, None)
+            return self._fetch(urllib.parse.urljoin(url, response.getheader("Location")), headers, redirects - 1)
+        if response.status >= 400:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return response.status, body, response.headers
+
+    def _connection(self, scheme, host):
+        """
+        The keep-alive connection of this thread to a host, and whether it was used before.
+        """
+        import http.client
+        connections = self._local.__dict__.setdefault("connections", {})
+        if (scheme, host) in connections:
+            return connections[scheme, host], True
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(host, timeout=self.timeout)
+        connections[scheme, host] = connection
+        with self._lock:
+            self._connections.append(connection)
+        return connection, False
+
+    def _drop_connection(self, scheme, host):
+        """
+        Close this thread's connection to a host, the next request opens a new one.
+        """
+        connection = self._local.__dict__.get("connections", {}).pop((scheme, host), None)
+        if connection is not None:
+            connection.close()
+
+    def _close_connections(self):
+        """
+        Close the connections of all threads at the end of an import.
+        """
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
 class PathListStrategy(ImportStrategy):
     """
     Image import strategy for importing images from a list of local file paths.
 
     Attributes:
-        None
+        cache: ImageCache the decoded images are shared through, or None.
     """
 
+    def __init__(self, cache=None):
+        """
+        Initialize a PathListStrategy.
+
+        Args:
+            cache: Optional ImageCache, so files requested again are not decoded again.
+        """
+        self.cache = cache
+
     def import_image(self, source):
         """
         Import images from a list of local file paths.
@@ -167,11 +541,237 @@ class PathListStrategy(ImportStrategy):
             source: A list of file paths to the images.
 
         Returns:
-            A list of images in RGB format.
+            A list of images in RGB format, read-only when they come from the cache.
         """
         images = []
         for path in source:
-            image = cv2.imread(path)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            images.append(image)
-        return images
\ No newline at end of file
+            if self.cache is not None:
+                images.append(self.cache.get(path, self.read_image, (self.scale, self.max_side)))
+            else:
+                images.append(self.read_image(path))
+        return images
+
+
+class PathStreamStrategy(ImportStrategy):
+    """
+    Image import strategy streaming images from an iterable of local file paths.
+
+    Images are yielded one at a time, in the order of the paths, while
+    background threads decode the next ones. OpenCV releases the GIL while
+    decoding, so decoding overlaps with whatever the caller does with the
+    current image. At most prefetch images are decoded ahead, so memory does
+    not grow with the number of paths.
+
+    Attributes:
+        prefetch: Maximum number of images decoded ahead of the one being consumed.
+        workers: Number of decoding threads.
+        cache: ImageCache the decoded images are shared through, or None.
+    """
+
+    def __init__(self, prefetch=8, workers=4, cache=None):
+        """
+        Initialize a PathStreamStrategy.
+
+        Args:
+            prefetch: Maximum number of images decoded ahead of the one being consumed.
+            workers: Number of decoding threads.
+            cache: Optional ImageCache, so files requested again are not decoded again.
+        """
+        self.prefetch = prefetch
+        self.workers = workers
+        self.cache = cache
+
+    def import_image(self, source):
+        """
+        Stream images from local file paths.
+
+        Args:
+            source: An iterable of file paths, consumed lazily.
+
+        Returns:
+            A generator of images in RGB format, in the order of source.
+        """
+        return self._stream(iter(source))
+
+    def _stream(self, paths):
+        """
+        Yield decoded images, keeping up to prefetch decodes in flight.
+        """
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            for path in paths:
+                pending.append(executor.submit(self._load, path))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # The caller may stop early, do not decode images nobody will read
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _load(self, path):
+        if self.cache is not None:
+            return self.cache.get(path, self.read_image, (self.scale, self.max_side))
+        return self.read_image(path)
+
+
+class PackedDatasetStrategy(ImportStrategy):
+    """
+    Image import strategy reading images from a PackedDataset.
+
+    Images are returned as read-only views of the memory-mapped dataset, so
+    nothing is decoded or copied. With a reduced resolution set they are area
+    resized, which does copy them.
+
+    Attributes:
+        dataset: The PackedDataset images are read from.
+    """
+
+    def __init__(self, dataset):
+        """
+        Initialize a PackedDatasetStrategy.
+
+        Args:
+            dataset: A PackedDataset, or the path of its data file.
+        """
+        self.dataset = dataset if isinstance(dataset, PackedDataset) else PackedDataset(dataset)
+
+    def import_image(self, source):
+        """
+        Import images from the dataset.
+
+        Args:
+            source: Index of an image, a slice, or a sequence of indices.
+
+        Returns:
+            The image at the index, or a list of images.
+        """
+        images = self.dataset[source]
+        if isinstance(images, list):
+            return [self.resize_image(image) for image in images]
+        return self.resize_image(images)
+
+
+class VideoStreamStrategy(ImportStrategy):
+    """
+    Image import strategy streaming the frames of a video file.
+
+    Frames are decoded by cv2.VideoCapture into a ring of preallocated
+    buffers, so no array is allocated per frame: a yielded frame stays valid
+    until `buffers` more frames have been yielded, copy it to keep it longer.
+    Skipped frames are only grabbed, never converted.
+
+    Attributes:
+        stride: Yield every stride-th frame.
+        start: Time in seconds of the first frame to yield, or None for the beginning.
+        end: Time in seconds to stop before, or None for the end of the video.
+        buffers: Number of frame buffers in the ring.
+    """
+
+    def __init__(self, stride=1, start=None, end=None, buffers=4):
+        """
+        Initialize a VideoStreamStrategy.
+
+        Args:
+            stride: Yield every stride-th frame.
+            start: Time in seconds of the first frame to yield, or None for the beginning.
+            end: Time in seconds to stop before, or None for the end of the video.
+            buffers: Number of frame buffers in the ring.
+        """
+        if stride < 1 or buffers < 1:
+            raise ValueError("stride and buffers must be at least 1")
+        self.stride = stride
+        self.start = start
+        self.end = end
+        self.buffers = buffers
+
+    def import_image(self, source):
+        """
+        Stream the frames of a video file.
+
+        Args:
+            source: Path or URL of the video, anything cv2.VideoCapture opens.
+
+        Returns:
+            A generator of frames in RGB format.
+        """
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise ValueError("Could not open the video {}".format(source))
+        return self._frames(capture)
+
+    def _frames(self, capture):
+        """
+        Yield the selected frames of an open capture through the buffer ring.
+        """
+        try:
+            first, stop = self._frame_range(capture)
+            if first:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+            decoded = None
+            ring = None
+            position = first
+            while stop is None or position < stop:
+                ok, decoded = capture.read(decoded)
+                if not ok:
+                    break
+                if ring is None:
+                    height, width = decoded.shape[:2]
+                    if self.scale is not None or self.max_side is not None:
+                        width, height = _target_size(width, height, self.scale, self.max_side)
+                        resized = np.empty((height, width, 3), dtype=np.uint8)
+                    ring = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.buffers)]
+                frame = ring[(position - first) // self.stride % self.buffers]
+                if frame.shape[:2] != decoded.shape[:2]:
+                    cv2.resize(decoded, (frame.shape[1], frame.shape[0]), dst=resized, interpolation=cv2.INTER_AREA)
+                    cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=frame)
+                else:
+                    cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB, dst=frame)
+                yield frame
+
+                # Skip the frames in between without retrieving them
+                for _ in range(self.stride - 1):
+                    position += 1
+                    if stop is not None and position >= stop or not capture.grab():
+                        return
+                position += 1
+        finally:
+            capture.release()
+
+    def _frame_range(self, capture):
+        """
+        The first frame and the frame to stop before (None for the end) of the time range.
+        """
+        if self.start is None and self.end is None:
+            return 0, None
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        if fps <= 0:
+            raise ValueError("The video does not report its frame rate, a time range cannot be used")
+        first = 0 if self.start is None else max(0, math.ceil(self.start * fps - 1e-6))
+        stop = None if self.end is None else math.ceil(self.end * fps - 1e-6)
+        return first, stop
+
+
+def pack_paths(paths, destination, scale=None, max_side=None, prefetch=8):
+    """
+    Decode a list of image files into a PackedDataset for PackedDatasetStrategy.
+
+    Files are decoded in the background by a PathStreamStrategy while the
+    previous ones are written, and only a few are held in memory at a time.
+
+    Args:
+        paths: Iterable of image file paths.
+        destination: Path of the data file to create.
+        scale: Factor in (0, 1] to reduce the images by, or None.
+        max_side: Largest side in pixels to reduce the images to, or None.
+        prefetch: Number of files decoded ahead of the one being written.
+
+    Returns:
+        The written PackedDataset.
+    """
+    reader = PathStreamStrategy(prefetch)
+    reader.set_resolution(scale, max_side)
+    return PackedDataset.write(destination, reader.import_image(paths))
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """
+    In-process cache of decoded images for the path import strategies.
+
+    Entries are kept per file and decode variant, and checked against the
+    file's modification time and size on every lookup, so a file changed on
+    disk is decoded again. The least recently used entries are dropped once
+    the images take more than max_bytes. Cached images are read-only, since
+    every caller shares them.
+
+    Attributes:
+        max_bytes: Memory budget of the cached images in bytes.
+        hits: Number of lookups answered from the cache.
+        misses: Number of lookups that had to decode the file.
+    """
+
+    def __init__(self, max_bytes=512 << 20):
+        """
+        Initialize an empty ImageCache.
+
+        Args:
+            max_bytes: Memory budget of the cached images in bytes, 512 MiB by default.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, loader, variant=None):
+        """
+        Return the decoded image of a file, decoding it with loader on a miss.
+
+        Args:
+            path: Path of the image file.
+            loader: Callable decoding the file at path into a NumPy array.
+            variant: Hashable telling apart different decodes of the same file,
+                such as the decode resolution.
+
+        Returns:
+            The decoded image as a read-only NumPy array.
+        """
+        key = (os.path.abspath(path), variant)
+        status = os.stat(key[0])
+        version = (status.st_mtime_ns, status.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        image = loader(path)
+        image.setflags(write=False)
+        with self._lock:
+            self._discard(key)
+            if image.nbytes <= self.max_bytes:
+                self._entries[key] = (version, image)
+                self.nbytes += image.nbytes
+                while self.nbytes > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+        return image
+
+    def clear(self):
+        """
+        Drop every cached image, the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "ImageCache(images={}, nbytes={}, hits={}, misses={})".format(
+            len(self), self.nbytes, self.hits, self.misses)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1].nbytes
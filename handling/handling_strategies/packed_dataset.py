@@ -0,0 +1,89 @@
+import os
+import numpy as np
+
+# Every image starts on a multiple of this many bytes of the data file
+PACK_ALIGNMENT = 64
+# Byte offset and (height, width, channels) of every image, 0 channels for 2D images
+PACK_INDEX_DTYPE = np.dtype([("offset", "<u8"), ("shape", "<u4", (3,))])
+
+
+class PackedDataset:
+    """
+    A corpus of uint8 images packed into one file and read through a memory map.
+
+    The images are stored back to back, uncompressed, in the data file. A
+    NumPy index next to it, at path + ".index.npy", holds the offset and shape
+    of every image. Opening maps both files without reading them, and every
+    image is returned as a read-only view of the map, so no pixel is copied
+    or read from disk before it is used.
+
+    Attributes:
+        path: Path of the data file.
+        index: The offsets and shapes of the images (memory-mapped).
+    """
+
+    def __init__(self, path):
+        """
+        Open a packed dataset written by PackedDataset.write.
+
+        Args:
+            path: Path of the data file.
+        """
+        self.path = path
+        self.index = np.load(path + ".index.npy", mmap_mode="r")
+        if self.index.dtype != PACK_INDEX_DTYPE:
+            raise ValueError("Not a packed dataset index: {}".format(path + ".index.npy"))
+        self._data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+
+    @classmethod
+    def write(cls, path, images):
+        """
+        Pack images into a new dataset, one image in memory at a time.
+
+        Args:
+            path: Path of the data file to create, the index is written next to it.
+            images: Iterable of 2D or 3D uint8 images.
+
+        Returns:
+            The written PackedDataset, opened.
+        """
+        entries = []
+        offset = 0
+        with open(path, "wb") as file:
+            for image in images:
+                image = np.ascontiguousarray(image)
+                if image.dtype != np.uint8 or image.ndim not in (2, 3):
+                    raise ValueError("Only 2D or 3D uint8 images can be packed")
+                padding = -offset % PACK_ALIGNMENT
+                file.write(bytes(padding))
+                offset += padding
+                entries.append((offset, image.shape + (0,) * (3 - image.ndim)))
+                file.write(image.data)
+                offset += image.nbytes
+        np.save(path + ".index.npy", np.array(entries, dtype=PACK_INDEX_DTYPE))
+        return cls(path)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, key):
+        """
+        The image at an index, or a list of images for a slice or a sequence of indices.
+        """
+        if isinstance(key, slice):
+            return [self._image(position) for position in range(*key.indices(len(self)))]
+        if isinstance(key, (int, np.integer)):
+            return self._image(key)
+        return [self._image(position) for position in key]
+
+    def __iter__(self):
+        return (self._image(position) for position in range(len(self)))
+
+    def __repr__(self):
+        return "PackedDataset({!r}, images={})".format(self.path, len(self))
+
+    def _image(self, position):
+        offset, shape = self.index[position]
+        shape = tuple(int(side) for side in shape if side)
+        offset = int(offset)
+        return self._data[offset:offset + int(np.prod(shape))].reshape(shape)
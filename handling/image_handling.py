@@ -20,6 +20,10 @@ class ImageHandling:
 
         Args:
             source (str): The source of the image to extract, depending on the chosen strategy.
+
+        Returns:
+            The extracted image, a list of images for the list strategies, or a
+            generator of images for the "pathstream" and "video" strategies.
         """
         self.image = self.extractStrategy.import_image(source)
         return self.image
@@ -31,6 +35,10 @@ class ImageHandling:
 
         Args:
             text (str, optional): Text to display alongside the image. Defaults to None.
+
+        Returns:
+            The montage array for the "montage" strategy, whether the frame was drawn
+            for the "live" strategy, None for the other matplotlib strategies.
         """
         imagen = self.image
         if text is not None:
@@ -41,18 +49,20 @@ class ImageHandling:
 
         if isinstance(imagen,list):
             numbers = [(i) for i in range(len(imagen))]
-            self.displayStrategy.display(imagen, numbers, figsize)
-        else:
-            self.displayStrategy.display(imagen, self.text, figsize)
+            return self.displayStrategy.display(imagen, numbers, figsize)
+        return self.displayStrategy.display(imagen, self.text, figsize)
 
-    def set_display_strategy(self, strategy, rows=None, cols=None):
+    def set_display_strategy(self, strategy, rows=None, cols=None, path=None, tile_size=256, fps=30):
         """
         Set the display strategy for rendering images.
 
         Args:
-            strategy (str): The display strategy to set ("single", "multiple", or "grid").
-            rows (int, optional): Number of rows for the grid display strategy. Defaults to None.
-            cols (int, optional): Number of columns for the grid display strategy. Defaults to None.
+            strategy (str): The display strategy to set ("single", "multiple", "grid", "montage", or "live").
+            rows (int, optional): Number of rows for the grid and montage display strategies. Defaults to None.
+            cols (int, optional): Number of columns for the grid and montage display strategies. Defaults to None.
+            path (str, optional): File the montage display strategy writes to. Defaults to None.
+            tile_size (int, optional): Tile side in pixels of the montage display strategy. Defaults to 256.
+            fps (float, optional): Maximum updates per second of the live display strategy. Defaults to 30.
 
         Raises:
             ValueError: If an invalid display strategy is provided.
@@ -63,32 +73,57 @@ class ImageHandling:
             self.displayStrategy = MultipleDisplayStrategy()
         elif strategy == "grid":
             self.displayStrategy = GridDisplayStrategy(rows, cols)
+        elif strategy == "montage":
+            self.displayStrategy = MontageDisplayStrategy(rows, cols, path, tile_size)
+        elif strategy == "live":
+            self.displayStrategy = LiveDisplayStrategy(fps)
         else:
             raise ValueError("Invalid display strategy")
 
-    def set_extract_strategy(self, strategy, width=None, height=None):
+    def set_extract_strategy(self, strategy, width=None, height=None, cache=None, prefetch=8,
+                             scale=None, max_side=None, dataset=None, stride=1, start=None, end=None):
         """
         Set the image extraction strategy.
 
         Args:
-            strategy (str): The extraction strategy to set ("path", "url", "numpy", "random", "pathlist", or "urllist").
+            strategy (str): The extraction strategy to set ("path", "url", "numpy", "random", "pathlist",
+                "pathstream", "urllist", "packed", or "video").
             width (int, optional): Width parameter for the extraction strategy. Defaults to None.
             height (int, optional): Height parameter for the extraction strategy. Defaults to None.
+            cache (DownloadCache or ImageCache, optional): On-disk download cache of the "url" and "urllist"
+                strategies, or decoded image cache of the "path", "pathlist" and "pathstream" strategies.
+                Defaults to None.
+            prefetch (int, optional): Images the "pathstream" strategy decodes ahead. Defaults to 8.
+            scale (float, optional): Reduce the extracted images by this factor in (0, 1]. Defaults to None.
+            max_side (int, optional): Reduce the extracted images so no side exceeds this. Defaults to None.
+            dataset (PackedDataset or str, optional): Dataset, or its data file, of the "packed" strategy.
+                Defaults to None.
+            stride (int, optional): The "video" strategy yields every stride-th frame. Defaults to 1.
+            start (float, optional): Time in seconds the "video" strategy starts at. Defaults to None.
+            end (float, optional): Time in seconds the "video" strategy stops before. Defaults to None.
 
         Raises:
             ValueError: If an invalid extraction strategy is provided.
         """
         if strategy == "path":
-            self.extractStrategy = FilePathImportStrategy()
+            self.extractStrategy = FilePathImportStrategy(cache)
         elif strategy == "url":
-            self.extractStrategy = UrlImportStrategy()
+            self.extractStrategy = UrlImportStrategy(cache)
         elif strategy == "numpy":
             self.extractStrategy = NumpyImportStrategy()
         elif strategy == "random":
-            self.extractStrategy = RandomImportStrategy()
+            self.extractStrategy = RandomImportStrategy(width, height)
         elif strategy == "pathlist":
-            self.extractStrategy = PathListStrategy()
+            self.extractStrategy = PathListStrategy(cache)
+        elif strategy == "pathstream":
+            self.extractStrategy = PathStreamStrategy(prefetch, cache=cache)
         elif strategy == "urllist":
-            self.extractStrategy = URLListStrategy()
+            self.extractStrategy = URLListStrategy(cache=cache)
+        elif strategy == "packed":
+            self.extractStrategy = PackedDatasetStrategy(dataset)
+        elif strategy == "video":
+            self.extractStrategy = VideoStreamStrategy(stride, start, end)
         else:
             raise ValueError("Invalid extract strategy")
+        # JPEG files are decoded directly at the reduced size, see ImportStrategy.set_resolution
+        self.extractStrategy.set_resolution(scale, max_side)
@@ -0,0 +1,106 @@
+"""
+Import time budget of the package entry points.
+
+Run as ``python import_budget.py`` from the repository root. Every entry point
+is imported in fresh interpreters with ``-X importtime``, the best of several
+runs is compared with its budget, and the heavy modules it must not load
+before a strategy needing them is selected are checked. The exit status is 1
+when an entry point goes over budget or loads a deferred module.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Best import time in ms allowed for every entry point. Most of it is cv2 and
+# NumPy, the entry points measured 130 to 180 ms when these budgets were set.
+BUDGETS_MS = {
+    "handling.image_handling": 250,
+    "segmentation.image_segmentation": 250,
+    "compression.image_compression": 250,
+    "feature_extraction.feature_detection": 250,
+    "feature_extraction.corner_detection": 250,
+}
+# Modules only imported once the strategy or method that needs them is used
+DEFERRED_MODULES = ("matplotlib", "scipy", "sqlite3", "http.client", "urllib.request", "concurrent.futures.process")
+
+
+def import_profile(module):
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Dotted name of the module.
+
+    Returns:
+        tuple: The cumulative import time of the module in ms and the names of
+        every module the import loaded.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                            cwd=root, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError("Importing {} failed:\n{}".format(module, result.stderr))
+
+    loaded = []
+    total = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        loaded.append(name)
+        if name == module:
+            total = int(fields[1]) / 1000
+    return total, loaded
+
+
+def check(budgets=BUDGETS_MS, repeat=3, scale=1.0):
+    """
+    Measure every entry point against its budget.
+
+    Args:
+        budgets (dict): Budget in ms of every entry point.
+        repeat (int): Number of fresh imports per entry point, the fastest one is reported.
+        scale (float): Factor applied to every budget, for slower machines.
+
+    Returns:
+        list: One result per entry point, with its time, budget, the deferred
+        modules it loaded and whether it passed.
+    """
+    results = []
+    for module, budget in budgets.items():
+        profiles = [import_profile(module) for _ in range(repeat)]
+        best = min(total for total, _ in profiles)
+        deferred = [heavy for heavy in DEFERRED_MODULES
+                    if any(name == heavy or name.startswith(heavy + ".") for name in profiles[0][1])]
+        results.append({"module": module, "import_ms": round(best, 1), "budget_ms": budget * scale,
+                        "deferred_loaded": deferred, "ok": best <= budget * scale and not deferred})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="Factor applied to every budget")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = check(repeat=args.repeat, scale=args.scale)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        for result in results:
+            print("{:<40} {:>7.1f} ms / {:>5.0f} ms  {}{}".format(
+                result["module"], result["import_ms"], result["budget_ms"], "ok" if result["ok"] else "OVER",
+                "  loads " + ", ".join(result["deferred_loaded"]) if result["deferred_loaded"] else ""))
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Speed and accuracy benchmark of the WatershedTh pyramid levels.
+
+Run as ``python -m segmentation.benchmark`` to segment synthetic cell images
+at several resolutions, plus any image files given with --images, with the
+markers computed at every pyramid level, and print the results as JSON. Every
+level is compared with the full-resolution markers (level 0): speedup, object
+count and intersection over union of the segmented objects.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+
+import benchmarking
+from .segmentation_strategies.thresholding_strategies import WatershedTh
+
+DEFAULT_SIZES = ((480, 640), (1080, 1920), (3000, 4000))
+DEFAULT_LEVELS = (0, 1, 2, 3)
+
+
+def synthetic_cells(height, width, seed=0):
+    """
+    Generate a reproducible microscopy-like RGB image: dark, partly touching
+    cells of different sizes on an unevenly lit, noisy background.
+
+    Args:
+        height (int): Image height.
+        width (int): Image width.
+        seed (int): Seed of the random cells and noise.
+
+    Returns:
+        numpy.ndarray: The (height, width, 3) uint8 image.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    cols = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    image = np.ascontiguousarray(200 + 30 * rows - 20 * cols, dtype=np.float32)
+
+    scale = min(height, width)
+    for _ in range(height * width // (scale // 8) ** 2):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        axes = (int(rng.integers(scale // 60, scale // 25)), int(rng.integers(scale // 60, scale // 25)))
+        cv2.ellipse(image, center, axes, float(rng.uniform(0, 180)), 0, 360, float(rng.uniform(40, 110)), -1)
+
+    image += rng.normal(0, 8, image.shape).astype(np.float32)
+    gray = np.clip(cv2.GaussianBlur(image, (0, 0), 1.0), 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+
+
+def foreground_iou(markers, reference):
+    """
+    Intersection over union of the objects (labels above the background 1) of two watershed label maps.
+    """
+    objects, reference_objects = markers > 1, reference > 1
+    union = np.count_nonzero(objects | reference_objects)
+    return 1.0 if union == 0 else np.count_nonzero(objects & reference_objects) / union
+
+
+def measure(image, levels, repeat=3):
+    """
+    Time WatershedTh.segment on an image with markers at a pyramid level.
+
+    Returns:
+        tuple: The WatershedTh of the last call and the best time in seconds.
+    """
+    watershed = WatershedTh()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        watershed.segment(image, levels)
+        best = min(best, time.perf_counter() - start)
+    return watershed, best
+
+
+def benchmark_image(name, image, levels=DEFAULT_LEVELS, repeat=3):
+    """
+    Benchmark WatershedTh at every pyramid level on one image.
+
+    Args:
+        name (str): Label of the image in the results.
+        image (numpy.ndarray): The RGB image.
+        levels (tuple): The pyramid levels to compare, level 0 is always measured as the reference.
+        repeat (int): Number of timed calls per level.
+
+    Returns:
+        dict: The image description and one result per level.
+    """
+    reference, reference_time = measure(image, 0, repeat)
+    results = []
+    for level in levels:
+        watershed, seconds = (reference, reference_time) if level == 0 else measure(image, level, repeat)
+        results.append({
+            "levels": level,
+            "seconds": seconds,
+            "speedup": reference_time / seconds,
+            "num_objects": int(watershed.num_objects),
+            "foreground_iou": foreground_iou(watershed.markersW, reference.markersW),
+        })
+    return {"image": name, "height": image.shape[0], "width": image.shape[1], "results": results}
+
+
+def run(sizes=DEFAULT_SIZES, paths=(), levels=DEFAULT_LEVELS, repeat=3):
+    """
+    Benchmark synthetic images of the given sizes and the image files in paths.
+
+    Returns:
+        dict: The environment the benchmark ran in and one result per image,
+        ready to be dumped as JSON.
+    """
+    return benchmarking.run(lambda name, image: benchmark_image(name, image, levels, repeat),
+                            synthetic_cells, sizes, paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    benchmarking.add_arguments(parser, DEFAULT_SIZES)
+    parser.add_argument("--levels", nargs="*", type=int, default=list(DEFAULT_LEVELS))
+    args = parser.parse_args(argv)
+    report = run(args.sizes, args.images, args.levels, args.repeat)
+    benchmarking.write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
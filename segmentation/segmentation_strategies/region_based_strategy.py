@@ -1,7 +1,125 @@
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
+
+# Columns of the moments returned by CountoursRb.analyze
+MOMENT_NAMES = ("m00", "m10", "m01", "m20", "m11", "m02")
+
+
+def contour_moments(contours):
+    """
+    Compute the spatial moments of many contours at once.
+
+    The moments of every polygon are summed over its edges with Green's
+    theorem, for the vertices of all the contours concatenated, so there is
+    no Python loop per contour. They match cv2.moments of each contour.
+
+    Args:
+        contours: Sequence of contours as returned by cv2.findContours.
+
+    Returns:
+        numpy.ndarray: (len(contours), 6) float64 moments, columns in MOMENT_NAMES order.
+    """
+    if not len(contours):
+        return np.zeros((0, len(MOMENT_NAMES)))
+    sizes = np.array([len(contour) for contour in contours])
+    starts = np.cumsum(sizes) - sizes
+    points = np.concatenate([contour.reshape(-1, 2) for contour in contours]).astype(np.float64)
+    following = np.arange(1, len(points) + 1)
+    following[starts + sizes - 1] = starts
+    x, y = points[:, 0], points[:, 1]
+    next_x, next_y = x[following], y[following]
+    cross = x * next_y - next_x * y
+
+    terms = np.column_stack([
+        cross / 2,
+        (x + next_x) * cross / 6,
+        (y + next_y) * cross / 6,
+        (x * x + x * next_x + next_x * next_x) * cross / 12,
+        (x * next_y + 2 * x * y + 2 * next_x * next_y + next_x * y) * cross / 24,
+        (y * y + y * next_y + next_y * next_y) * cross / 12,
+    ])
+    moments = np.add.reduceat(terms, starts, axis=0)
+    # Like cv2.moments, the moments do not depend on the contour orientation
+    return moments * np.where(moments[:, :1] < 0, -1.0, 1.0)
+
+
 class CountoursRb:
+    """
+    Contour based region segmentation.
+
+    segment renders both contour pipelines at once. analyze only computes
+    the geometry of one pipeline, without drawing or copying the image, and
+    render draws the last analysis when it is needed.
+
+    Pipelines:
+        - "otsu": external contours of the Otsu threshold of the blurred image.
+        - "canny": contour tree of the dilated Canny edges of the blurred image.
+    """
+
+    def analyze(self, image, pipeline="otsu"):
+        """
+        Compute the contours of an image and their geometry, without rendering.
+
+        Args:
+            image (numpy.ndarray): The input image, RGB or gray.
+            pipeline (str): The contour pipeline, "otsu" or "canny".
+
+        Returns:
+            dict: "contours" as returned by cv2.findContours, "hierarchy" as an
+            (n, 4) int array, "moments" as an (n, 6) array with MOMENT_NAMES
+            columns, "area" of every contour and "centroids" as (n, 2) (x, y),
+            NaN for contours of zero area.
+        """
+        gray_image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        filtered_image = cv2.GaussianBlur(gray_image, (5, 5), 0)
+        contours, hierarchy = self._find_contours(filtered_image, pipeline)
+
+        moments = contour_moments(contours)
+        area = moments[:, 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            centroids = np.where(area[:, None] > 0, moments[:, 1:3] / area[:, None], np.nan)
+        self.image = image
+        self.analysis = {
+            "contours": contours,
+            "hierarchy": np.zeros((0, 4), dtype=np.int32) if hierarchy is None else hierarchy.reshape(-1, 4),
+            "moments": moments,
+            "area": area,
+            "centroids": centroids,
+        }
+        return self.analysis
+
+    def render(self, image=None):
+        """
+        Draw the contours, centroids and hierarchy of the last analysis.
+
+        Args:
+            image (numpy.ndarray, optional): The image to draw on, defaults to the analyzed image.
+
+        Returns:
+            numpy.ndarray: A copy of the image with the contours in green and the centroids in red.
+        """
+        rendered = np.copy(self.image if image is None else image)
+        analysis = self.analysis
+        cv2.drawContours(rendered, analysis["contours"], -1, (0, 255, 0), 2)
+        for (cX, cY), links in zip(analysis["centroids"], analysis["hierarchy"]):
+            if np.isnan(cX):
+                continue
+            cX, cY = int(cX), int(cY)
+            cv2.circle(rendered, (cX, cY), 7, (0, 0, 255), -1)
+            cv2.putText(rendered, str(links), (cX - 20, cY - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        return rendered
+
+    def _find_contours(self, filtered_image, pipeline):
+        # Contours and hierarchy of a blurred gray image with one of the pipelines
+        if pipeline == "otsu":
+            ret, thresh = cv2.threshold(filtered_image,0,255,cv2.THRESH_OTSU)
+            return cv2.findContours(thresh,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_SIMPLE)
+        elif pipeline == "canny":
+            edged = cv2.Canny(filtered_image,150,255)
+            kernel = np.ones((3,3),np.uint8)
+            edged_best = cv2.dilate(edged,kernel,iterations=1)
+            return cv2.findContours(edged_best,cv2.RETR_TREE,cv2.CHAIN_APPROX_NONE)
+        raise ValueError("Invalid contour pipeline: {}".format(pipeline))
 
     def segment(self, image):
 
@@ -12,15 +130,10 @@ class CountoursRb:
 
         filtered_image = cv2.GaussianBlur(gray_image,(5,5),0)
 
-        ret, thresh = cv2.threshold(filtered_image,0,255,cv2.THRESH_OTSU)
-
-        contours, hierarchy = cv2.findContours(thresh,cv2.RETR_EXTERNAL,cv2.CHAIN_APPROX_SIMPLE)
+        contours, hierarchy = self._find_contours(filtered_image, "otsu")
         img_contours = cv2.drawContours(image_base,contours,-1,(0,255,0),3)
 
-        edged = cv2.Canny(filtered_image,150,255)
-        kernel = np.ones((3,3),np.uint8)
-        edged_best = cv2.dilate(edged,kernel,iterations=1)
-        contours2, hierarchy2 = cv2.findContours(edged_best,cv2.RETR_TREE,cv2.CHAIN_APPROX_NONE)
+        contours2, hierarchy2 = self._find_contours(filtered_image, "canny")
         img_contours2 =  cv2.drawContours(image_base2,contours2[3],-1,(0,255,0),3)
 
         for i,c in enumerate(contours):
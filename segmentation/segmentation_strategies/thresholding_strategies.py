@@ -54,53 +54,280 @@ class OtsuTh:
         return binary_image
 
 class SplitMergeTh:
-    def segment(self, image):
+    """
+    Split and merge segmentation of the gray levels of an image.
+
+    The image is split as a quadtree: a block whose gray levels vary more than
+    threshold is split into four, down to min_size pixels. The mean and
+    variance of every block come in constant time from the summed-area tables
+    of the image and of its square. Adjacent leaves are then merged, in
+    rounds, while their union stays homogeneous, with the regions kept in a
+    union-find parent array. Blocks of min_size pixels are leaves even when
+    they are not homogeneous, so regions straddling an edge can vary more
+    than threshold.
+
+    Attributes:
+        labels: Label of every pixel of the last segmented image, from 0 to num_regions - 1.
+        num_regions: Number of regions of the last segmented image.
+        stats: Dict of per-region arrays, "area" in pixels and the "mean" and
+            "std" of the gray levels, indexed by label.
+    """
+
+    def segment(self, image, threshold=10.0, min_size=8):
         """
         Segment an image using the Split and Merge algorithm.
 
         Args:
             image (numpy.ndarray): The input image.
+            threshold (float): Maximum standard deviation of the gray levels in a region.
+            min_size (int): Side in pixels below which blocks are not split further.
 
         Returns:
-            numpy.ndarray: The segmented image.
+            numpy.ndarray: The label map (int32) of the regions.
         """
         if len(image.shape) == 3:
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Implement Split and Merge segmentation algorithm using OpenCV
-        # You may need to write a custom function for this
+        if threshold < 0 or min_size < 1:
+            raise ValueError("threshold must be non-negative and min_size at least 1")
+        height, width = image.shape
+        sums, squares = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+        leaves, cell = self._split(sums, squares, height, width, threshold ** 2, min_size)
+        grid = self._leaf_grid(leaves, cell, height, width)
+        count = np.concatenate([level[3] for level in leaves])
+        total = np.concatenate([level[4] for level in leaves])
+        square = np.concatenate([level[5] for level in leaves])
+
+        parent = self._merge(grid, count, total, square, threshold ** 2)
+        roots, leaf_labels = np.unique(parent, return_inverse=True)
+        area = np.bincount(leaf_labels, count, len(roots))
+        mean = np.bincount(leaf_labels, total, len(roots)) / area
+        variance = np.bincount(leaf_labels, square, len(roots)) / area - mean ** 2
+        self.stats = {"area": area.astype(np.int64), "mean": mean, "std": np.sqrt(np.maximum(variance, 0))}
+        self.num_regions = len(roots)
+
+        labels = leaf_labels.astype(np.int32)[grid]
+        self.labels = np.repeat(np.repeat(labels, cell, axis=0), cell, axis=1)[:height, :width]
+        return self.labels
+
+    def _split(self, sums, squares, height, width, limit, min_size):
+        """
+        Split the image as a quadtree, level by level, all the blocks of a level at once.
+
+        Returns:
+            The leaves as one (side, top, left, pixels, sum, sum of squares)
+            tuple of arrays per level with leaves, and the side of the smallest leaves.
+        """
+        side = 1 << max(height, width, 1).bit_length()
+        top = np.zeros(1, dtype=np.int64)
+        left = np.zeros(1, dtype=np.int64)
+        leaves = []
+        while len(top):
+            bottom, right = np.minimum(top + side, height), np.minimum(left + side, width)
+            count = ((bottom - top) * (right - left)).astype(np.float64)
+            total = sums[bottom, right] - sums[top, right] - sums[bottom, left] + sums[top, left]
+            square = squares[bottom, right] - squares[top, right] - squares[bottom, left] + squares[top, left]
+            variance = square / count - (total / count) ** 2
+
+            split = variance > limit if side > min_size else np.zeros(len(top), dtype=bool)
+            leaf = ~split
+            if leaf.any():
+                leaves.append((side, top[leaf], left[leaf], count[leaf], total[leaf], square[leaf]))
+                cell = side
+            side //= 2
+            top = (top[split][:, None] + [0, 0, side, side]).ravel()
+            left = (left[split][:, None] + [0, side, 0, side]).ravel()
+            inside = (top < height) & (left < width)
+            top, left = top[inside], left[inside]
+        return leaves, cell
+
+    def _leaf_grid(self, leaves, cell, height, width):
+        """
+        Map every cell x cell square of the image to the index of the leaf covering it.
+        """
+        rows, cols = -(-height // cell), -(-width // cell)
+        grid = np.zeros((rows, cols), dtype=np.int64)
+        first = 0
+        for side, top, left, count, _, _ in leaves:
+            scale = side // cell
+            level = np.full((-(-rows // scale), -(-cols // scale)), -1, dtype=np.int64)
+            level[top // side, left // side] = np.arange(first, first + len(top))
+            level = np.repeat(np.repeat(level, scale, axis=0), scale, axis=1)[:rows, :cols]
+            np.copyto(grid, level, where=level >= 0)
+            first += len(top)
+        return grid
+
+    def _merge(self, grid, count, total, square, limit):
+        """
+        Merge adjacent leaves while their union stays homogeneous.
 
-        # For example:
-        # segmented_image = split_and_merge(image)
+        Every round, each region picks the neighbor giving the most homogeneous
+        union. A region no other region picks joins the one it picks, and each
+        picked region takes in the regions joining it greedily, most similar
+        first, as long as their union stays homogeneous. Picked regions that
+        take in nobody merge with each other when they pick each other, so the
+        globally best pair always merges. Pairs whose union is not homogeneous
+        are set aside until one of their regions changes, so every round only
+        costs as much as the pairs that can still merge.
 
-        # return segmented_image
-        pass 
+        Returns:
+            numpy.ndarray: The root leaf of the region of every leaf.
+        """
+        size = len(count)
+        first, second = [], []
+        for near, far in ((grid[:, :-1], grid[:, 1:]), (grid[:-1], grid[1:])):
+            apart = near != far
+            first.append(near[apart])
+            second.append(far[apart])
+        first, second = np.concatenate(first), np.concatenate(second)
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        parent = np.arange(size)
+        count, total, square = count.copy(), total.copy(), square.copy()
+        retired_first = retired_second = np.zeros(0, dtype=np.int64)
+        touched = np.ones(size, dtype=bool)
+        changed = parent
+        while True:
+            # Pairs of regions changed last round, retired ones included, are
+            # renamed to their roots and deduplicated. The other pairs are
+            # still unique, and the merged regions point straight at their
+            # root, so one lookup is enough
+            back = touched[retired_first] | touched[retired_second]
+            moved = touched[first] | touched[second]
+            a = parent[np.concatenate([first[moved], retired_first[back]])]
+            b = parent[np.concatenate([second[moved], retired_second[back]])]
+            retired_first, retired_second = retired_first[~back], retired_second[~back]
+            touched[changed] = False
+            apart = a != b
+            renamed = np.sort(np.minimum(a, b)[apart] * size + np.maximum(a, b)[apart])
+            renamed = renamed[np.r_[True, renamed[1:] != renamed[:-1]]]
+            first = np.concatenate([first[~moved], renamed // size])
+            second = np.concatenate([second[~moved], renamed % size])
+            pairs = first * size + second
+            union = count[first] + count[second]
+            variance = (square[first] + square[second]) / union - ((total[first] + total[second]) / union) ** 2
+            valid = variance <= limit
+            retired_first = np.concatenate([retired_first, first[~valid]])
+            retired_second = np.concatenate([retired_second, second[~valid]])
+            first, second, pairs, variance = first[valid], second[valid], pairs[valid], variance[valid]
+            if not len(first):
+                break
+
+            # Ties are broken by the pair, so the globally best pair is mutual
+            ends = np.concatenate([first, second])
+            others = np.concatenate([second, first])
+            scores = np.tile(variance, 2)
+            order = np.lexsort((np.tile(pairs, 2), scores, ends))
+            ends, others, scores = ends[order], others[order], scores[order]
+            best = np.r_[True, ends[1:] != ends[:-1]]
+            ends, others, scores = ends[best], others[best], scores[best]
+
+            # Regions nobody picks join their pick, most similar first, while
+            # the union with the picked region stays homogeneous
+            joining = ~np.isin(ends, others)
+            members, hosts, scores = ends[joining], others[joining], scores[joining]
+            order = np.lexsort((scores, hosts))
+            members, hosts = members[order], hosts[order]
+            starts = np.flatnonzero(np.diff(hosts, prepend=-1))
+            lengths = np.diff(np.r_[starts, len(hosts)])
+            sums = []
+            for stat in (count, total, square):
+                running = np.cumsum(stat[members])
+                sums.append(running - np.repeat(running[starts] - stat[members][starts], lengths) + stat[hosts])
+            union_variance = sums[2] / sums[0] - (sums[1] / sums[0]) ** 2
+            failed = np.cumsum(union_variance > limit)
+            accepted = failed == np.repeat(failed[starts] - (union_variance[starts] > limit), lengths)
+            members, hosts = members[accepted], hosts[accepted]
+
+            # Picked regions taking in nobody merge in pairs picking each other
+            hosting = np.isin(ends, hosts)
+            picks = others[np.searchsorted(ends, others)]
+            mutual = (picks == ends) & (ends < others) & ~joining & ~hosting & ~np.isin(others, hosts)
+            members = np.concatenate([members, others[mutual]])
+            hosts = np.concatenate([hosts, ends[mutual]])
+
+            parent[members] = hosts
+            for stat in (count, total, square):
+                np.add.at(stat, hosts, stat[members])
+            changed = np.concatenate([members, hosts])
+            touched[changed] = True
+        return self._find(parent, np.arange(size))
+
+    def _find(self, parent, nodes):
+        # Root of every node in a union-find parent array, by pointer jumping
+        found = parent[nodes]
+        while True:
+            above = parent[found]
+            if np.array_equal(above, found):
+                return found
+            found = above
 
 class WatershedTh:
-    def segment(self, image):
+    def segment(self, image, levels=0):
         """
         Segment an image using the Watershed algorithm.
 
+        The foreground and background markers can be computed on a reduced
+        pyramid level and upsampled, only the final watershed pass runs at
+        full resolution. Every level halves the resolution of the markers:
+        the thresholding, morphology and distance transform get about four
+        times faster, at the cost of less precise markers.
+
         Args:
             image (numpy.ndarray): The input image.
+            levels (int): Number of pyramid levels below full resolution the
+                markers are computed at, 0 for full resolution.
 
         Returns:
             numpy.ndarray: The segmented image with marked boundaries in blue.
         """
+        if levels < 0:
+            raise ValueError("levels must be non-negative")
         image_copy = np.copy(image)
         self.image_copy = image_copy
 
         gray_image = cv2.cvtColor(image,cv2.COLOR_RGB2GRAY)
+        height, width = gray_image.shape
+        for _ in range(levels):
+            gray_image = cv2.pyrDown(gray_image)
+        scale = gray_image.shape[1] / width
+
+        ret, markers = self._markers(gray_image, scale)
+        if levels:
+            markers = cv2.resize(markers, (width, height), interpolation=cv2.INTER_NEAREST)
+
+        markersW = cv2.watershed(image_copy,markers)
+        image_copy[markersW == -1] = [255,0,0]
+        # Marker 1 is the background, every other marker is one object
+        self.num_objects = ret - 1
+        self.image_watershed = image_copy
+        self.markersW = markersW
+        self.stats = None
+
+        return image_copy
 
-        thresh  = cv2.adaptiveThreshold(gray_image,255,cv2.ADAPTIVE_THRESH_GAUSSIAN_C,cv2.THRESH_BINARY_INV,499,9)
+    def _markers(self, gray_image, scale):
+        """
+        Compute the watershed markers of a gray image reduced by scale from
+        full resolution, the neighborhood sizes being reduced with it.
 
-        kernel = np.ones((5,5),np.uint8)
+        Returns:
+            tuple: The number of markers including the background, and the
+            markers (int32): 1 for the sure background, 2 and up for the sure
+            foreground objects, 0 for the unknown pixels.
+        """
+        block_size = max(3, int(499 * scale) | 1)
+        thresh  = cv2.adaptiveThreshold(gray_image,255,cv2.ADAPTIVE_THRESH_GAUSSIAN_C,cv2.THRESH_BINARY_INV,block_size,9)
+
+        # 5x5 and 3x3 kernels at full resolution, no smaller than 3x3 once reduced
+        large = 2 * max(1, round(2 * scale)) + 1
+        small = 2 * max(1, round(scale)) + 1
+        kernel = np.ones((large,large),np.uint8)
         opening = cv2.morphologyEx(thresh,cv2.MORPH_OPEN,kernel,iterations=3)
 
-        kernel = np.ones((3,3),np.uint8)
+        kernel = np.ones((small,small),np.uint8)
         opening = cv2.dilate(opening,kernel)
 
-        kernel = np.ones((5,5),np.uint8)
+        kernel = np.ones((large,large),np.uint8)
         sure_bg = cv2.dilate(opening,kernel,iterations=3)
 
         dist_transform = cv2.distanceTransform(opening,cv2.DIST_L2,cv2.DIST_MASK_PRECISE)
@@ -112,51 +339,150 @@ class WatershedTh:
         ret, markers = cv2.connectedComponents(sure_fg)
         markers = markers+1
         markers[unknown==255] = 0
+        return ret, markers
 
-        markersW = cv2.watershed(image_copy,markers)
-        image_copy[markersW == -1] = [255,0,0]
-        self.num_objects = len(markersW)
-        self.image_watershed = image_copy
-        self.markersW = markersW
-        
-        return image_copy
+    def region_stats(self):
+        """
+        Compute the statistics of every watershed region in one pass over the labels.
+
+        Every statistic is accumulated for all the labels at once with
+        np.bincount and ufunc.at, so the cost is linear in the number of pixels
+        whatever the number of regions. Boundary pixels (-1) belong to no region.
+
+        Returns:
+            dict: Arrays indexed by label, 0 to markersW.max(): "area" in pixels,
+            "centroid" as (x, y), "bbox" as (x, y, width, height) like
+            cv2.boundingRect, and "mean_color" per channel. Labels without
+            pixels have an area of 0 and zero statistics.
+        """
+        if self.stats is not None:
+            return self.stats
+        labels = self.markersW.ravel()
+        inside = labels >= 0
+        labels = labels[inside]
+        size = int(self.markersW.max()) + 1
+        rows, cols = np.divmod(np.flatnonzero(inside), self.markersW.shape[1])
+
+        area = np.bincount(labels, minlength=size)
+        count = np.maximum(area, 1)
+        centroid = np.column_stack([np.bincount(labels, cols, size), np.bincount(labels, rows, size)]) / count[:, None]
+
+        first = np.full((size, 2), np.iinfo(np.int64).max)
+        last = np.full((size, 2), -1)
+        for axis, coordinates in enumerate((cols, rows)):
+            np.minimum.at(first[:, axis], labels, coordinates)
+            np.maximum.at(last[:, axis], labels, coordinates)
+        first[area == 0] = 0
+        last[area == 0] = -1
+        bbox = np.column_stack([first, last - first + 1])
+
+        # The boundaries drawn on image_copy are the -1 pixels, left out here
+        pixels = self.image_copy.reshape(len(inside), -1)[inside]
+        mean_color = np.column_stack([np.bincount(labels, pixels[:, channel], size)
+                                      for channel in range(pixels.shape[1])]) / count[:, None]
+
+        self.stats = {"area": area, "centroid": centroid, "bbox": bbox, "mean_color": mean_color}
+        return self.stats
 
     def add_centroids(self):
-        centroids = []
+        """
+        Draw the centroid of every object, the background region excluded.
+
+        Returns:
+            numpy.ndarray: A copy of the watershed image with the centroids in green.
+        """
+        stats = self.region_stats()
         image_copy = np.copy(self.image_copy)
-        for label in range(1, self.markersW.max() + 1):
-            mask = (self.markersW == label).astype(np.uint8)
-            moments = cv2.moments(mask)
-            centroid_x = int(moments["m10"] / moments["m00"])
-            centroid_y = int(moments["m01"] / moments["m00"])
-            if label != 1:
-                centroids.append((centroid_x, centroid_y))
-        
-        for centroid in centroids:
-            cv2.circle(image_copy, centroid, 5, (0, 255, 0), -1)
+        objects = np.flatnonzero(stats["area"])
+        objects = objects[objects > 1]
+        for centroid_x, centroid_y in stats["centroid"][objects].astype(int):
+            cv2.circle(image_copy, (int(centroid_x), int(centroid_y)), 5, (0, 255, 0), -1)
 
         return image_copy
 
 class RegionGrowingTh:
-    def segment(self, image, seed_point):
+    """
+    Region growing segmentation from one or many seeds at once.
+
+    All the regions grow together, one ring of pixels per step, as a
+    breadth-first flood fill over a preallocated label array: the queue of
+    every step is the array of pixels claimed by the previous one, so no
+    pixel is visited twice and nothing is allocated per pixel. The label
+    array has a border of -1 that stops the fill at the image edges. A pixel
+    joins a region when its gray level is within tolerance of the seed's, or
+    of the region's running mean. A pixel reached by several regions in the
+    same step joins one of them.
+
+    Attributes:
+        labels: Label of every pixel of the last segmented image, the index of
+            its seed plus one, 0 for pixels no region reached.
+        stats: Dict of per-seed arrays, "area" in pixels and the "mean" gray
+            level of every region, indexed by label - 1.
+    """
+
+    def segment(self, image, seed_point, tolerance=10, running_mean=False, connectivity=4):
         """
         Segment an image using the Region Growing algorithm.
 
         Args:
             image (numpy.ndarray): The input image.
-            seed_point (tuple): The seed point for region growing.
+            seed_point (tuple): The (x, y) seed point for region growing, or a
+                sequence or (N, 2) array of seed points, grown at once.
+            tolerance (float): Largest gray level difference a pixel may have with its region.
+            running_mean (bool): Compare pixels with the running mean of the
+                region rather than with its seed.
+            connectivity (int): 4 or 8, the neighbors a region grows to.
 
         Returns:
-            numpy.ndarray: The segmented image.
+            numpy.ndarray: The label map (int32) of the regions.
         """
         if len(image.shape) == 3:
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Implement Region Growing segmentation algorithm using OpenCV
-        # You may need to write a custom function for this
-
-        # For example:
-        # segmented_image = region_growing(image, seed_point)
-
-        # return segmented_image
-        pass
+        if connectivity not in (4, 8):
+            raise ValueError("connectivity must be 4 or 8")
+        height, width = image.shape
+        seeds = np.asarray(seed_point, dtype=np.int64).reshape(-1, 2)
+        if len(seeds) and ((seeds < 0).any() or (seeds[:, 0] >= width).any() or (seeds[:, 1] >= height).any()):
+            raise ValueError("Seed points must lie inside the image")
+
+        # Flat indices into the image padded by one pixel on every side
+        stride = width + 2
+        gray = cv2.copyMakeBorder(image, 1, 1, 1, 1, cv2.BORDER_CONSTANT).ravel()
+        labels = np.full((height + 2, stride), -1, dtype=np.int32)
+        labels[1:-1, 1:-1] = 0
+        flat_labels = labels.ravel()
+        offsets = [-stride, stride, -1, 1]
+        if connectivity == 8:
+            offsets += [-stride - 1, -stride + 1, stride - 1, stride + 1]
+
+        # Seeds on an already seeded pixel are dropped, the first one keeps it
+        positions = (seeds[:, 1] + 1) * stride + seeds[:, 0] + 1
+        frontier, owners = np.unique(positions, return_index=True)
+        flat_labels[frontier] = owners + 1
+        area = np.bincount(owners, minlength=len(seeds)).astype(np.float64)
+        total = np.bincount(owners, gray[frontier], minlength=len(seeds))
+        reference = gray[positions].astype(np.float64)
+
+        while len(frontier):
+            if running_mean:
+                reference = total / np.maximum(area, 1)
+            frontier_reference = reference[owners]
+            # The frontier shifted by one offset has no repeated pixel, and every
+            # offset sees the claims of the previous ones, so each pixel is claimed once
+            claimed = []
+            claimed_owners = []
+            for offset in offsets:
+                candidates = frontier + offset
+                grow = flat_labels[candidates] == 0
+                grow &= np.abs(gray[candidates] - frontier_reference) <= tolerance
+                candidates = candidates[grow]
+                flat_labels[candidates] = owners[grow] + 1
+                claimed.append(candidates)
+                claimed_owners.append(owners[grow])
+            frontier, owners = np.concatenate(claimed), np.concatenate(claimed_owners)
+            area += np.bincount(owners, minlength=len(seeds))
+            total += np.bincount(owners, gray[frontier], minlength=len(seeds))
+
+        self.stats = {"area": area.astype(np.int64), "mean": total / np.maximum(area, 1)}
+        self.labels = labels[1:-1, 1:-1]
+        return self.labels